@@ -2,10 +2,18 @@ from services.google_drive_service import GoogleDriveService
 from services.document_service import DocumentService
 from services.mysql_service import MySQLService
 from services.embedding_service import EmbeddingService
-from services.pinecone_service import PineconeService
+from services.pinecone_service import get_pinecone_service
 from services.cleanup_service import CleanupService
 from utils.logger import logger
 from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import queue
+
+# Resolve .env once at import time so every entrypoint (script, worker,
+# interactive session) sees the same environment without each having to
+# remember to call load_dotenv() first.
+load_dotenv()
 
 class App:
     def __init__(self):
@@ -15,7 +23,8 @@ class App:
         self.mysql_service = MySQLService()
         self.document_service = DocumentService(mysql_service=self.mysql_service)
         self.embedding_service = EmbeddingService()
-        self.pinecone_service = PineconeService()
+        self.pinecone_service = get_pinecone_service()
+        self.cleanup_service = None  # lazily created on first cleanup()
 
         self.requested_files = [
             "dev-introduction"
@@ -48,12 +57,16 @@ class App:
                 return
             
             mapped_docs, chunked_docs = self.document_service.process(documents=filenames)
-            inserted_chunks = self.mysql_service.bulk_insert_chunks(chunked_docs)
 
-            # Generate embeddings
-            embedded_chunks = self.embedding_service.generate_embeddings(inserted_chunks)
-            total_upserted = self.pinecone_service.sync(embedded_chunks)
-            logger.info(f"Sync Complete.")
+            # Chunk IDs are assigned client-side in DocumentService, so the
+            # MySQL insert and the embed/upsert pipeline can run concurrently
+            # over the same chunks instead of back to back.
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                insert_future = executor.submit(self.mysql_service.bulk_insert_chunks, chunked_docs)
+                upsert_future = executor.submit(self._embed_and_upsert, chunked_docs)
+                insert_future.result()
+                total_upserted = upsert_future.result()
+            logger.info(f"Sync Complete. Upserted {total_upserted} vector(s).")
         finally:
             # Always clear the documents directory at the end to prevent mixing prod/dev documents
             try:
@@ -62,15 +75,67 @@ class App:
                 logger.error(f"Failed to clear download directory: {e}")
                 # Don't raise - we want sync to complete even if cleanup fails
 
+    def _embed_and_upsert(self, chunks) -> int:
+        """
+        Overlap embedding generation with Pinecone upserts.
+
+        Embedding is OpenAI-API-bound and upserting is Pinecone-bound, so
+        running them as producer/consumer stages over a bounded queue turns
+        the sum of the two stage times into roughly the max of them.
+        """
+        embedded_queue = queue.Queue(maxsize=4)  # bounded for backpressure
+        producer_error = []  # slot for an exception raised on the producer thread
+
+        def embed_worker():
+            try:
+                for item in self.embedding_service.iter_embedded_groups(chunks):
+                    embedded_queue.put(item)
+            except Exception as e:
+                # Surface the failure to the consumer — a swallowed producer
+                # crash would otherwise end the sync with a clean-looking log.
+                producer_error.append(e)
+            finally:
+                embedded_queue.put(None)  # signal completion
+
+        producer = threading.Thread(target=embed_worker, daemon=True)
+        producer.start()
+
+        total_upserted = 0
+        try:
+            while True:
+                item = embedded_queue.get()
+                if item is None:
+                    break
+                doc_id, embedded = item
+                total_upserted += self.pinecone_service.upsert_chunks(embedded, doc_id)
+        except Exception:
+            # Unblock the producer before re-raising: it may be parked on
+            # put() against the bounded queue, so drain until its sentinel
+            # arrives or the thread would leak and pin the remaining chunks.
+            while embedded_queue.get() is not None:
+                pass
+            producer.join()
+            raise
+
+        producer.join()
+        if producer_error:
+            raise producer_error[0]
+        return total_upserted
+
     def cleanup(self):
         """Clean up documents from MySQL and Pinecone, then clear local files."""
         try:
-            cleanup = CleanupService(
-                mysql_service=self.mysql_service,
-                pinecone_index=self.pinecone_service.index,
-                requested_files=self.requested_files
-            )
-            cleanup.run()
+            # Reuse the service across calls so the underlying clients
+            # (and their connections) are only bound once.
+            if self.cleanup_service is None:
+                self.cleanup_service = CleanupService(
+                    mysql_service=self.mysql_service,
+                    pinecone_index=self.pinecone_service.index,
+                    requested_files=self.requested_files
+                )
+            else:
+                self.cleanup_service.requested_files = self.requested_files
+            self.cleanup_service.run()
         finally:
             # Always clear the documents directory at the end to prevent mixing prod/dev documents
             try:
@@ -80,6 +145,5 @@ class App:
                 # Don't raise - we want cleanup to complete even if file cleanup fails
 
 if __name__ == "__main__":
-    load_dotenv()
     app = App()
     app.run()
\ No newline at end of file
@@ -1,4 +1,5 @@
 from typing import List
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from utils.logger import logger
 import os
 
@@ -16,8 +17,9 @@ class CleanupService:
                 logger.error("[Cleanup] MySQL service is not initialized")
                 return []
             
-            # Extract titles from filenames (remove extension)
-            titles = [os.path.splitext(file)[0] for file in self.requested_files]
+            # Extract titles from filenames (remove extension), deduplicated
+            # up front so the query below only sees unique titles.
+            titles = list(dict.fromkeys(os.path.splitext(file)[0] for file in self.requested_files))
             
             if not titles:
                 logger.warning("[Cleanup] No files provided for cleanup")
@@ -51,24 +53,39 @@ class CleanupService:
             raise
 
     def delete_chunks_in_pinecone(self, document_ids: List[str]) -> None:
-        """Delete all Pinecone chunks with matching document_id metadata."""
+        """Delete all Pinecone chunks with matching document_id metadata.
+
+        Deletes are independent per document and network-bound, so they are
+        dispatched concurrently instead of one round-trip at a time.
+        """
         if not document_ids:
             return
-        
-        for doc_id in document_ids:
-            try:
-                self.index.delete(filter={"document_id": {"$eq": doc_id}})
-                logger.info(f"[Cleanup] Deleted Pinecone chunks for document {doc_id}.")
-            except Exception as e:
-                logger.error(f"[Cleanup] Failed to delete Pinecone chunks for {doc_id}: {e}")
+
+        with ThreadPoolExecutor(max_workers=min(32, len(document_ids))) as executor:
+            futures = {
+                executor.submit(self.index.delete, filter={"document_id": {"$eq": doc_id}}): doc_id
+                for doc_id in document_ids
+            }
+            for future in as_completed(futures):
+                doc_id = futures[future]
+                try:
+                    future.result()
+                    logger.debug("[Cleanup] Deleted Pinecone chunks for document %s.", doc_id)
+                except Exception as e:
+                    logger.error("[Cleanup] Failed to delete Pinecone chunks for %s: %s", doc_id, e)
 
     def run(self):
-        """Run cleanup in modular order — MySQL first, then Pinecone."""
+        """Run cleanup — MySQL and Pinecone deletes in parallel."""
         document_ids = self.get_document_ids()
         if not document_ids:
             logger.warning("No documents to delete.")
             return
-        
-        self.delete_documents_in_mysql(document_ids)
-        self.delete_chunks_in_pinecone(document_ids)
+
+        # The two stores are independent and both deletes are idempotent,
+        # so they can run concurrently instead of back to back.
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            mysql_future = executor.submit(self.delete_documents_in_mysql, document_ids)
+            pinecone_future = executor.submit(self.delete_chunks_in_pinecone, document_ids)
+            mysql_future.result()
+            pinecone_future.result()
         logger.info("[Cleanup] Document removal completed.")
\ No newline at end of file
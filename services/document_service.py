@@ -1,20 +1,95 @@
 import os
-import pandas as pd
+import csv
+import uuid
+import atexit
+import zipfile
+import hashlib
 from datetime import datetime
-from docx import Document
+from lxml import etree
 from utils.logger import logger
-from utils.tokens import count_tokens
+from utils.tokens import count_tokens_batch
 from typing import List, Dict, Tuple
-import nltk
-from nltk.tokenize import sent_tokenize
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from models.database import KBDocument
 
-# Download NLTK data if not already present
+# Sentence segmentation: prefer blingfire's native (C++) tokenizer, which is
+# an order of magnitude faster than NLTK's pure-Python punkt model on large
+# corpora; fall back to NLTK when blingfire isn't installed.
 try:
-    nltk.data.find('tokenizers/punkt_tab')
-except LookupError:
-    logger.info("Downloading NLTK punkt_tab tokenizer...")
-    nltk.download('punkt_tab', quiet=True)
+    from blingfire import text_to_sentences as _text_to_sentences
+
+    def sent_tokenize(text):
+        return [s for s in _text_to_sentences(text).split("\n") if s]
+except ImportError:
+    import nltk
+    from nltk.tokenize import sent_tokenize as _nltk_sent_tokenize
+
+    _NLTK_READY = False
+
+    def _ensure_punkt():
+        """Probe for (and download) punkt data once per process, lazily.
+
+        The data-tree lookup stats the NLTK data path, so doing it at import
+        made every process — including parse workers — pay for it up front.
+        """
+        global _NLTK_READY
+        if _NLTK_READY:
+            return
+        try:
+            nltk.data.find('tokenizers/punkt_tab')
+        except LookupError:
+            logger.info("Downloading NLTK punkt_tab tokenizer...")
+            nltk.download('punkt_tab', quiet=True)
+        _NLTK_READY = True
+
+    def sent_tokenize(text):
+        _ensure_punkt()
+        return _nltk_sent_tokenize(text)
+
+_DOCX_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+def _extract_docx_text(file_path):
+    """
+    Extract paragraph text from a .docx by streaming word/document.xml.
+
+    iterparse visits text runs and paragraph boundaries directly and clears
+    elements as it goes, avoiding the full DOM plus rich object graph that
+    python-docx builds just to read p.text.
+    """
+    paragraphs = []
+    run_texts = []
+    with zipfile.ZipFile(file_path) as z, z.open("word/document.xml") as f:
+        for _, element in etree.iterparse(f, events=("end",), tag=(_DOCX_NS + "p", _DOCX_NS + "t")):
+            if element.tag == _DOCX_NS + "t":
+                run_texts.append(element.text or "")
+            else:  # end of a paragraph
+                text = "".join(run_texts)
+                run_texts.clear()
+                if text.strip():
+                    paragraphs.append(text)
+                element.clear()
+    return "\n".join(paragraphs)
+
+def _extract_document_text(file_path):
+    """Extract plain text from a downloaded document (.txt or .docx)."""
+    if file_path.endswith(".txt"):
+        # utf-8-sig strips the BOM that Drive's text/plain export prepends;
+        # plain utf-8 would leak U+FEFF into the first chunk's content,
+        # hash and embedding.
+        with open(file_path, encoding="utf-8-sig") as f:
+            return f.read()
+    return _extract_docx_text(file_path)
+
+def _read_document_file(file_path):
+    """
+    Read one document file in a worker process.
+    Module-level so it stays picklable. Returns (file_path, text, error).
+    """
+    try:
+        return file_path, _extract_document_text(file_path), None
+    except Exception as e:
+        return file_path, None, str(e)
 
 class DocumentService:
     
@@ -24,6 +99,16 @@ class DocumentService:
         self.mysql_service = mysql_service
         os.makedirs(os.path.dirname(error_log_path), exist_ok=True)
 
+        # One long-lived append handle for the error log instead of a
+        # stat + open + close per logged error.
+        write_header = not os.path.exists(error_log_path) or os.path.getsize(error_log_path) == 0
+        self._err_fh = open(error_log_path, "a", newline="")
+        self._err_writer = csv.writer(self._err_fh)
+        if write_header:
+            self._err_writer.writerow(["timestamp", "filename", "error"])
+            self._err_fh.flush()
+        atexit.register(self._err_fh.close)
+
         # Chunking parameters
         self.CHUNK_MIN_SIZE = 500
         self.CHUNK_MAX_SIZE = 800
@@ -35,57 +120,102 @@ class DocumentService:
             Generate chunks for the documents.
             Returns a list of records that were successfully mapped with chunks.
         """
-        mapped_docs = self._map_documents(documents=documents)
+        mapped_docs, new_doc_ids = self._map_documents(documents=documents)
         chunked_docs = self._generate_chunks(mapped_docs)
-        
+        chunked_docs = self._filter_unchanged_chunks(chunked_docs, known_new_doc_ids=new_doc_ids)
+
         return mapped_docs, chunked_docs
 
-    def _map_documents(self, documents: List[str] = None) -> List[Dict]:
+    def _filter_unchanged_chunks(self, chunks: List[Dict], known_new_doc_ids=()) -> List[Dict]:
+        """
+        Drop chunks whose (document_id, content_hash) already exists in the
+        database, so unchanged content skips re-embedding and re-upserting.
+
+        Documents in known_new_doc_ids were inserted this run and cannot
+        have stored chunks, so they are left out of the existence query —
+        when every document is new the round-trip is skipped entirely.
+        """
+        if not chunks or not self.mysql_service:
+            return chunks
+
+        known_new = set(known_new_doc_ids)
+        document_ids = list({chunk["document_id"] for chunk in chunks} - known_new)
+        if not document_ids:
+            return chunks
+        try:
+            existing = self.mysql_service.get_chunk_hashes_by_document_ids(document_ids)
+        except Exception as e:
+            logger.error(f"Failed to fetch existing chunk hashes, keeping all chunks: {e}")
+            return chunks
+
+        if not existing:
+            return chunks
+
+        fresh = [c for c in chunks if (c["document_id"], c["content_hash"]) not in existing]
+        skipped = len(chunks) - len(fresh)
+        if skipped:
+            logger.info(f"Skipped {skipped} unchanged chunk(s) already stored in the database.")
+        return fresh
+
+    def _map_documents(self, documents: List[str] = None) -> Tuple[List[Dict], set]:
         """
         Map .docx files to existing database records and update their content.
-        Returns a list of records that were successfully updated.
-        
+        Returns the successfully mapped records plus the IDs of documents
+        inserted this run, so downstream stages can skip existence checks
+        for brand-new documents.
+
         Parameters:
             documents (List[str], optional): List of filenames to process.
                 If None, all .docx files in the directory are considered.
         """
-        
+
         total_docs = 0
         mapped_documents = []
+        new_doc_ids = set()
 
-        # List all .docx files in the directory
-        all_files = [f for f in os.listdir(self.docs_dir) if f.endswith(".docx")]
+        # List downloaded documents via scandir — DirEntry caches the file
+        # type, so no extra stat() per entry. Google Docs arrive as .txt,
+        # uploaded Word files as .docx.
+        all_files = [
+            entry.name for entry in os.scandir(self.docs_dir)
+            if entry.is_file() and entry.name.endswith((".docx", ".txt"))
+        ]
 
-        # Filter files if documents parameter is provided
-        files_to_process = [f for f in all_files if not documents or f in documents]
+        # Filter files if documents parameter is provided; a set keeps the
+        # membership test O(1) per file instead of scanning the allowlist
+        allowed = set(documents) if documents else None
+        files_to_process = [f for f in all_files if allowed is None or f in allowed]
 
         if not files_to_process:
             logger.warning("No documents to process.")
-            return []
+            return [], new_doc_ids
+
+        # Parse all files up front — the zip + XML work is CPU-bound,
+        # so it runs across worker processes while the DB mapping below
+        # stays serial.
+        file_paths = [os.path.join(self.docs_dir, f) for f in files_to_process]
+        contents = self._read_documents_parallel(file_paths)
+
+        # One batched lookup for every title instead of a round-trip per file
+        titles = [os.path.splitext(f)[0] for f in files_to_process]
+        existing_documents = self.mysql_service.get_documents_by_titles(titles)
 
         for filename in files_to_process:
             total_docs += 1
             title = os.path.splitext(filename)[0]
             file_path = os.path.join(self.docs_dir, filename)
 
-            # Read .docx content
-            content = self._read_docx(file_path)
+            content = contents[file_path]
             if not content.strip():
-                logger.warning(f"Empty content for: {title}")
+                logger.warning("Empty content for: %s", title)
                 continue
 
             try:
-                # Fetch existing document from the database
-                document = self.mysql_service.get_document_by_title(title)
-
-                # Read .docx content
-                content = self._read_docx(file_path)
-                if not content.strip():
-                    logger.warning(f"Empty content for: {title}")
-                    continue
-                
+                # Look up the prefetched record for this title
+                document = existing_documents.get(title)
+
                 if not document:
-                    logger.warning(f"Document not found in the database: {title}")
+                    logger.warning("Document not found in the database: %s", title)
                     payload = KBDocument(
                         title=title,
                         content=content
@@ -94,10 +224,11 @@ class DocumentService:
                     # if document is new, insert one.
                     data = self.mysql_service.insert_document(payload)
                     if data:
-                        logger.info(f"Inserted new document: {title}")
+                        logger.info("Inserted new document: %s", title)
                         mapped_documents.append(data)
+                        new_doc_ids.add(data["id"])
                     else:
-                        logger.warning(f"Failed to insert new document: {title}")
+                        logger.warning("Failed to insert new document: %s", title)
                     continue # Proceed or Skip to next document
 
                 # Update the content in the document
@@ -105,11 +236,30 @@ class DocumentService:
                 mapped_documents.append(document)
             except Exception as e:
                 self._log_error(title, str(e))
-                logger.error(f"Error while mapping document {title}.")
+                logger.error("Error while mapping document %s.", title)
                 raise
         
         logger.info(f"Mapped {len(mapped_documents)}/{total_docs} documents.")
-        return mapped_documents
+        return mapped_documents, new_doc_ids
+
+    def _read_documents_parallel(self, file_paths: List[str]) -> Dict[str, str]:
+        """
+        Parse .docx files across worker processes and return {path: text}.
+        Raises on the first failed file, matching the serial behavior.
+        """
+        workers = int(os.getenv("DOCX_WORKERS", max(1, (os.cpu_count() or 2) - 1)))
+        if len(file_paths) == 1 or workers <= 1:
+            return {path: self._read_document(path) for path in file_paths}
+
+        contents = {}
+        with ProcessPoolExecutor(max_workers=min(workers, len(file_paths))) as executor:
+            for path, text, error in executor.map(_read_document_file, file_paths):
+                if error is not None:
+                    logger.error("Failed to read %s.", path)
+                    self._log_error(path, error)
+                    raise RuntimeError(f"Failed to read {path}: {error}")
+                contents[path] = text
+        return contents
     
     def _generate_chunks(self, documents: List[Dict]) -> List[Dict]:
         """
@@ -118,22 +268,26 @@ class DocumentService:
         """
         all_chunks = []
 
-        for _, doc in enumerate(documents):
+        for doc in documents:
             doc_id = doc["id"]
-            content = str(doc["content"])
+            content = doc.get("content") or ""
             title = doc.get("title")
 
             chunks = self._chunk_text(content)
-            for idx, chunk in enumerate(chunks):
-                token_count = count_tokens(chunk)
+            for idx, (chunk, token_count) in enumerate(chunks):
                 all_chunks.append({
+                    # IDs are assigned client-side so downstream stages
+                    # (DB insert, embeddings) can run without waiting on
+                    # the database to hand back generated keys.
+                    "id": str(uuid.uuid4()),
                     "document_id": doc_id,
                     "chunk_index": idx,
                     "content": chunk,
+                    "content_hash": hashlib.sha256(chunk.encode("utf-8")).hexdigest(),
                     "token_count": token_count
                 })
             
-            logger.info(f"Generated {len(chunks)} chunks for document: {title}")
+            logger.debug("Generated %d chunks for document: %s", len(chunks), title)
         
         logger.info(f"Total generated {len(all_chunks)} chunks across all documents")
         return all_chunks
@@ -141,45 +295,53 @@ class DocumentService:
     def _chunk_text(self, text: str):
         """
         Split text into chunks with overlap and sentence boundaries.
+
+        Each sentence is tokenized exactly once; chunk token counts are the
+        running sums of their sentences, so nothing is re-tokenized for the
+        overlap or for the emitted chunk.
+
+        Returns:
+            list: (chunk_text, token_count) tuples.
         """
         sentences = sent_tokenize(text)
+        token_counts = count_tokens_batch(sentences)
+
         chunks = []
-        current_chunk = []
+        current_chunk = deque()  # (sentence, token_count) pairs
         current_tokens = 0
 
-        for sentence in sentences:
-            sentence_tokens = count_tokens(sentence)
-
+        for sentence, sentence_tokens in zip(sentences, token_counts):
             # If adding this sentence would exceed max tokens → start new chunk
             if current_tokens + sentence_tokens > self.CHUNK_MAX_SIZE:
                 if current_chunk:
-                    chunks.append(" ".join(current_chunk))
-                
-                # Start overlap
+                    chunks.append((" ".join(s for s, _ in current_chunk), current_tokens))
+
+                # Start overlap — appendleft keeps the rollback O(overlap)
+                # instead of list.insert(0, ...)'s O(n) shift per sentence
                 overlap_tokens = 0
-                overlap_chunk = []
+                overlap_chunk = deque()
                 while current_chunk and overlap_tokens < self.CHUNK_OVERLAP:
-                    sent = current_chunk.pop()
-                    overlap_chunk.insert(0, sent)
-                    overlap_tokens += count_tokens(sent)
+                    sent, tokens = current_chunk.pop()
+                    overlap_chunk.appendleft((sent, tokens))
+                    overlap_tokens += tokens
 
-                current_chunk = overlap_chunk + [sentence]
+                overlap_chunk.append((sentence, sentence_tokens))
+                current_chunk = overlap_chunk
                 current_tokens = overlap_tokens + sentence_tokens
             else:
-                current_chunk.append(sentence)
+                current_chunk.append((sentence, sentence_tokens))
                 current_tokens += sentence_tokens
 
         # Add last chunk
         if current_chunk:
-            chunks.append(" ".join(current_chunk))
+            chunks.append((" ".join(s for s, _ in current_chunk), current_tokens))
 
         return chunks
     
-    def _read_docx(self, file_path):
-        """Read .docx file and return plain text."""
+    def _read_document(self, file_path):
+        """Read a downloaded document (.txt or .docx) and return plain text."""
         try:
-            doc = Document(file_path)
-            return "\n".join(p.text for p in doc.paragraphs if p.text.strip())
+            return _extract_document_text(file_path)
         except Exception as e:
             logger.error(f"Failed to read {file_path}.")
             self._log_error(file_path, str(e))
@@ -188,19 +350,8 @@ class DocumentService:
     def _log_error(self, filename, error_message):
         """Append error details to error log CSV with timestamp."""
         try:
-            timestamp = datetime.now().isoformat()
-            df = pd.DataFrame([
-                {
-                    "timestamp": timestamp,
-                    "filename": filename,
-                    "error": error_message
-                }
-            ])
-
-            if os.path.exists(self.error_log_path):
-                df.to_csv(self.error_log_path, mode="a", index=False, header=False)
-            else:
-                df.to_csv(self.error_log_path, index=False)
+            self._err_writer.writerow([datetime.now().isoformat(), filename, error_message])
+            self._err_fh.flush()
         except Exception as e:
             logger.error(f"Failed to write to error log: {e}")
             raise
\ No newline at end of file
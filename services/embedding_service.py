@@ -2,37 +2,130 @@ from utils.logger import logger
 from openai import OpenAI
 from typing import List, Dict, Any
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+import numpy as np
 import os
 
 class EmbeddingService:
     def __init__(self):
         self.embedding_model = os.getenv("EMBEDDING_MODEL", "")
         self.api_key = os.getenv("OPENAI_API_KEY", "")
+        self.batch_size = int(os.getenv("EMBED_BATCH_SIZE", 128))
+        self.max_workers = int(os.getenv("EMBED_WORKERS", 8))
+        self.total_tokens = 0  # running usage across all requests
+        self._usage_lock = threading.Lock()
 
         self.client = OpenAI(api_key=self.api_key)
 
-    def generate_embeddings(self, document_chunks: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    def embed_chunks(self, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
-        Generate embeddings for a list of document chunks, grouped by document_id.
-        
+        Generate embeddings for a list of chunks in place.
+
+        Chunks are embedded in batches of up to `batch_size` inputs per API
+        request instead of one request per chunk, sorted by content length so
+        each batch packs similar-sized inputs.
+
         Returns:
-            dict: {document_id: [chunk_dicts_with_embeddings]}
+            list: The chunks that were embedded successfully.
         """
-        grouped_embeddings = defaultdict(list)
+        # Smart batching: group similar-length inputs together
+        ordered = sorted(chunks, key=lambda c: len(c.get("content", "")))
+        batches = [
+            ordered[start:start + self.batch_size]
+            for start in range(0, len(ordered), self.batch_size)
+        ]
 
-        for chunk in document_chunks:
-            doc_id = str(chunk.get("document_id"))
+        if not batches:
+            return []
+        if len(batches) == 1:
+            return self._embed_batch(batches[0])
+
+        # The API calls are latency-bound, so in-flight batches stack up
+        # almost linearly until the account rate limit.
+        embedded = []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as executor:
+            futures = [executor.submit(self._embed_batch, batch) for batch in batches]
+            for future in as_completed(futures):
+                embedded.extend(future.result())
+
+        return embedded
+
+    def _embed_batch(self, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Embed one batch of chunks with a single API request.
+
+        Falls back to embedding the chunks one by one if the batched request
+        fails, so a single bad input cannot poison the whole batch.
+        """
+        try:
+            response = self.client.embeddings.create(
+                model=self.embedding_model,
+                input=[chunk["content"] for chunk in batch]
+            )
+            # response.data is ordered to match the input list. Embeddings
+            # are kept as float32 arrays — ~4x smaller than lists of Python
+            # floats — and only converted back to lists at upsert time.
+            for chunk, data in zip(batch, response.data):
+                chunk['embedding'] = np.asarray(data.embedding, dtype=np.float32)
+            self._record_usage(response)
+            return batch
+        except Exception as e:
+            logger.warning("[Embeddings] Batch of %d chunk(s) failed (%s); retrying individually.", len(batch), e)
+            return self._embed_individually(batch)
+
+    def _embed_individually(self, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Per-chunk fallback for a failed batch; keeps whatever succeeds."""
+        embedded = []
+        for chunk in batch:
             try:
                 response = self.client.embeddings.create(
                     model=self.embedding_model,
                     input=chunk["content"]
                 )
-                embedding = response.data[0].embedding
-                chunk['embedding'] = embedding
-                grouped_embeddings[doc_id].append(chunk)
+                chunk['embedding'] = np.asarray(response.data[0].embedding, dtype=np.float32)
+                self._record_usage(response)
+                embedded.append(chunk)
             except Exception as e:
-                logger.error(f"[Embeddings] Failed to generate embedding for [doc: {doc_id} | chunk: {chunk.get('id')}]: {e}")
-                continue
+                logger.error(
+                    "[Embeddings] Failed to generate embedding for [doc: %s | chunk: %s]: %s",
+                    chunk.get("document_id"), chunk.get("id"), e
+                )
+        return embedded
+
+    def _record_usage(self, response) -> None:
+        """Accumulate token usage reported by the API."""
+        usage = getattr(response, "usage", None)
+        if usage:
+            with self._usage_lock:
+                self.total_tokens += usage.total_tokens
+
+    def iter_embedded_groups(self, document_chunks: List[Dict[str, Any]]):
+        """
+        Yield (document_id, embedded_chunks) per document as embeddings
+        complete, so consumers can start downstream work (DB inserts,
+        Pinecone upserts) before the whole corpus is embedded.
+        """
+        grouped = defaultdict(list)
+        for chunk in document_chunks:
+            grouped[str(chunk.get("document_id"))].append(chunk)
+
+        for doc_id, chunks in grouped.items():
+            embedded = self.embed_chunks(chunks)
+            if embedded:
+                yield doc_id, embedded
+
+    def generate_embeddings(self, document_chunks: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Generate embeddings for a list of document chunks, grouped by document_id.
+
+        Returns:
+            dict: {document_id: [chunk_dicts_with_embeddings]}
+        """
+        grouped_embeddings = defaultdict(list)
+
+        for chunk in self.embed_chunks(document_chunks):
+            grouped_embeddings[str(chunk.get("document_id"))].append(chunk)
 
         logger.info(f"[Embeddings] Generated embeddings for {len(grouped_embeddings)} documents.")
         return dict(grouped_embeddings)
\ No newline at end of file
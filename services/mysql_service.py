@@ -6,6 +6,7 @@ from pymysql.err import OperationalError, InterfaceError
 from utils.logger import logger
 from models.database import KBDocument, KBDocumentChunk
 from typing import Optional, Dict, List
+from datetime import datetime
 import uuid
 
 class MySQLService:
@@ -23,6 +24,11 @@ class MySQLService:
             self.document_table = os.getenv("DOCUMENT_TABLE")
             self.chunk_table = os.getenv("CHUNK_TABLE")
             self.max_retries = 3
+
+            # Hot query texts are built once — table names never change
+            # after startup, so there is no need to re-format per call.
+            self._q_document_by_title = f"SELECT * FROM {self.document_table} WHERE title = %s"
+            self._q_chunks_by_document = f"SELECT * FROM {self.chunk_table} WHERE document_id = %s ORDER BY chunk_index ASC"
             
             # Create connection pool with Cloud SQL Connector
             self.pool = PooledDB(
@@ -87,7 +93,8 @@ class MySQLService:
             title TEXT NOT NULL,
             content TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            INDEX idx_title (title(255))
             )
             """,
             f"""
@@ -96,9 +103,11 @@ class MySQLService:
             document_id CHAR(36),
             chunk_index INT NOT NULL,
             content TEXT NOT NULL,
+            content_hash CHAR(64),
             token_count INT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (document_id) REFERENCES {self.document_table}(id) ON DELETE CASCADE
+            FOREIGN KEY (document_id) REFERENCES {self.document_table}(id) ON DELETE CASCADE,
+            INDEX idx_content_hash (document_id, content_hash)
             )
             """,
             # f"""
@@ -110,20 +119,114 @@ class MySQLService:
         for q in queries:
             self.execute_query(q)
 
+        self._run_migrations()
+
         logger.info("Knowledge base tables created.")
 
+    def _run_migrations(self):
+        """
+        Bring pre-existing tables up to the current schema.
+
+        CREATE TABLE IF NOT EXISTS is a no-op on databases that already
+        have the tables, so additive changes — the content_hash dedup
+        column and the lookup indexes — are applied here, each guarded by
+        an information_schema check to stay idempotent.
+        """
+        if not self._column_exists(self.chunk_table, "content_hash"):
+            self.execute_query(f"ALTER TABLE {self.chunk_table} ADD COLUMN content_hash CHAR(64)")
+            logger.info(f"[MySQL] Added content_hash column to {self.chunk_table}")
+
+        if not self._index_exists(self.chunk_table, "idx_content_hash"):
+            self.execute_query(f"ALTER TABLE {self.chunk_table} ADD INDEX idx_content_hash (document_id, content_hash)")
+            logger.info(f"[MySQL] Added idx_content_hash index to {self.chunk_table}")
+
+        if not self._index_exists(self.document_table, "idx_title"):
+            self.execute_query(f"ALTER TABLE {self.document_table} ADD INDEX idx_title (title(255))")
+            logger.info(f"[MySQL] Added idx_title index to {self.document_table}")
+
+    def _column_exists(self, table: str, column: str) -> bool:
+        """Check information_schema for a column on a table in the current database."""
+        rows = self.execute_query(
+            "SELECT 1 FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s",
+            (table, column), fetch=True
+        )
+        return bool(rows)
+
+    def _index_exists(self, table: str, index: str) -> bool:
+        """Check information_schema for an index on a table in the current database."""
+        rows = self.execute_query(
+            "SELECT 1 FROM information_schema.STATISTICS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s",
+            (table, index), fetch=True
+        )
+        return bool(rows)
+
     def get_document_by_title(self, title: str):
         """Fetch a document by its title."""
-        query = f"SELECT * FROM {self.document_table} WHERE title = %s"
-        results = self.execute_query(query, (title,), fetch=True)
+        results = self.execute_query(self._q_document_by_title, (title,), fetch=True)
         return results[0] if results else None
     
+    def get_documents_by_titles(self, titles: list) -> Dict[str, Dict]:
+        """Fetch documents for a list of titles in one query, keyed by title."""
+        if not titles:
+            return {}
+
+        conn = self.pool.connection()
+        try:
+            documents = {}
+            with conn.cursor() as cursor:
+                for start in range(0, len(titles), 1000):
+                    batch = titles[start:start + 1000]
+                    placeholders = ','.join(['%s'] * len(batch))
+                    query = f"SELECT * FROM {self.document_table} WHERE title IN ({placeholders})"
+                    cursor.execute(query, batch)
+                    for row in cursor.fetchall():
+                        documents[row["title"]] = row
+            return documents
+        except Exception as e:
+            logger.error(f"[MySQL] Error fetching documents by titles: {e}")
+            raise
+        finally:
+            conn.close()
+
     def get_chunks_by_document_id(self, document_id: str):
         """Fetch chunks by document ID."""
-        query = f"SELECT * FROM {self.chunk_table} WHERE document_id = %s ORDER BY chunk_index ASC"
-        results = self.execute_query(query, (document_id,), fetch=True)
+        results = self.execute_query(self._q_chunks_by_document, (document_id,), fetch=True)
         return results
     
+    def get_chunks_by_document_ids(self, document_ids: list) -> Dict[str, List[Dict]]:
+        """
+        Fetch chunk rows for many documents in one query, grouped by document_id.
+
+        Only id, document_id and chunk_index are selected — callers diffing
+        against stored chunks never read content, so transferring it would
+        waste most of the payload.
+        """
+        if not document_ids:
+            return {}
+
+        conn = self.pool.connection()
+        try:
+            grouped = {doc_id: [] for doc_id in document_ids}
+            with conn.cursor() as cursor:
+                for start in range(0, len(document_ids), 1000):
+                    batch = document_ids[start:start + 1000]
+                    placeholders = ','.join(['%s'] * len(batch))
+                    query = (
+                        f"SELECT id, document_id, chunk_index FROM {self.chunk_table} "
+                        f"WHERE document_id IN ({placeholders}) ORDER BY document_id, chunk_index"
+                    )
+                    cursor.execute(query, batch)
+                    for row in cursor.fetchall():
+                        grouped.setdefault(row["document_id"], []).append(row)
+            return grouped
+        except Exception as e:
+            logger.error(f"[MySQL] Error fetching chunks by document IDs: {e}")
+            raise
+        finally:
+            conn.close()
+
     def get_document_ids_by_titles(self, titles: list) -> list:
         """Fetch document IDs for a list of titles."""
         if not titles:
@@ -131,32 +234,65 @@ class MySQLService:
         
         conn = self.pool.connection()
         try:
+            document_ids = []
             with conn.cursor() as cursor:
-                # Create placeholders for IN clause
-                placeholders = ','.join(['%s'] * len(titles))
-                query = f"SELECT id, title FROM {self.document_table} WHERE title IN ({placeholders})"
-                cursor.execute(query, titles)
-                results = cursor.fetchall()
-                return [doc["id"] for doc in results]
+                # One IN query per batch of 1000 titles instead of per-title lookups
+                for start in range(0, len(titles), 1000):
+                    batch = titles[start:start + 1000]
+                    placeholders = ','.join(['%s'] * len(batch))
+                    query = f"SELECT id, title FROM {self.document_table} WHERE title IN ({placeholders})"
+                    cursor.execute(query, batch)
+                    document_ids.extend(doc["id"] for doc in cursor.fetchall())
+            return document_ids
         except Exception as e:
             logger.error(f"[MySQL] Error fetching document IDs by titles: {e}")
             raise
         finally:
             conn.close()
     
+    def get_chunk_hashes_by_document_ids(self, document_ids: list) -> set:
+        """Fetch (document_id, content_hash) pairs for existing chunks."""
+        if not document_ids:
+            return set()
+
+        conn = self.pool.connection()
+        try:
+            pairs = set()
+            with conn.cursor() as cursor:
+                for start in range(0, len(document_ids), 1000):
+                    batch = document_ids[start:start + 1000]
+                    placeholders = ','.join(['%s'] * len(batch))
+                    query = f"SELECT document_id, content_hash FROM {self.chunk_table} WHERE document_id IN ({placeholders})"
+                    cursor.execute(query, batch)
+                    pairs.update(
+                        (row["document_id"], row["content_hash"])
+                        for row in cursor.fetchall() if row["content_hash"]
+                    )
+            return pairs
+        except Exception as e:
+            logger.error(f"[MySQL] Error fetching chunk hashes: {e}")
+            raise
+        finally:
+            conn.close()
+
     def delete_documents_by_ids(self, document_ids: list) -> None:
         """Delete documents by their IDs. Chunks will be deleted automatically due to CASCADE."""
         if not document_ids:
             return
-        
+
         conn = self.pool.connection()
         try:
             conn.begin()
+            deleted_count = 0
             with conn.cursor() as cursor:
-                placeholders = ','.join(['%s'] * len(document_ids))
-                query = f"DELETE FROM {self.document_table} WHERE id IN ({placeholders})"
-                cursor.execute(query, document_ids)
-                deleted_count = cursor.rowcount
+                # One bulk DELETE per batch instead of per-id statements;
+                # batches of 500 keep the IN list packet-friendly.
+                for start in range(0, len(document_ids), 500):
+                    batch = document_ids[start:start + 500]
+                    placeholders = ','.join(['%s'] * len(batch))
+                    query = f"DELETE FROM {self.document_table} WHERE id IN ({placeholders})"
+                    cursor.execute(query, batch)
+                    deleted_count += cursor.rowcount
             conn.commit()
             logger.info(f"[MySQL] Deleted {deleted_count} document(s) from {self.document_table}")
         except Exception as e:
@@ -208,14 +344,18 @@ class MySQLService:
                     (document_id, document.title, document.content)
                 )
 
-                # Fetch the inserted document
-                cursor.execute(
-                    f"SELECT * FROM {self.document_table} WHERE id = %s",
-                    (document_id,)
-                )
-                inserted_doc = cursor.fetchone()
-
             conn.commit()
+
+            # Build the returned record from values already in hand instead
+            # of a SELECT-back round-trip; timestamps mirror the defaults.
+            now = datetime.now()
+            inserted_doc = {
+                "id": document_id,
+                "title": document.title,
+                "content": document.content,
+                "created_at": now,
+                "updated_at": now,
+            }
             logger.info(f"[MySQL] Inserted document '{document.title}' with UUID {document_id}")
             return inserted_doc
 
@@ -235,26 +375,28 @@ class MySQLService:
             with conn.cursor() as cursor:
                 insert_query = f"""
                     INSERT INTO {self.chunk_table}
-                    (id, document_id, chunk_index, content, token_count)
-                    VALUES (%s, %s, %s, %s, %s)
+                    (id, document_id, chunk_index, content, content_hash, token_count)
+                    VALUES (%s, %s, %s, %s, %s, %s)
                 """
 
+                rows = []
                 for chunk in chunks:
-                    chunk_id = str(uuid.uuid4())
+                    # Honor client-side pre-assigned IDs; generate otherwise
+                    chunk_id = chunk.get("id") or str(uuid.uuid4())
                     chunk["id"] = chunk_id
+                    rows.append((
+                        chunk_id,
+                        chunk["document_id"],
+                        chunk["chunk_index"],
+                        chunk["content"],
+                        chunk.get("content_hash"),
+                        chunk.get("token_count", 0),
+                    ))
 
-                    cursor.execute(
-                        insert_query,
-                        (
-                            chunk_id,
-                            chunk["document_id"],
-                            chunk["chunk_index"],
-                            chunk["content"],
-                            chunk.get("token_count", 0),
-                        )
-                    )
-
-                    logger.debug(f"Chunk UUID generated: {chunk_id}")
+                # executemany coalesces rows into multi-row INSERT statements;
+                # batches of 1000 keep each statement packet-friendly.
+                for start in range(0, len(rows), 1000):
+                    cursor.executemany(insert_query, rows[start:start + 1000])
 
             conn.commit()
             logger.info(f"[MySQL] Bulk inserted {len(chunks)} chunks with UUIDs")
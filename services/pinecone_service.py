@@ -1,17 +1,105 @@
 from typing import List, Dict, Any
-from pinecone import Pinecone
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from utils.logger import logger
+
+# Prefer the gRPC client for upserts: protobuf over HTTP/2 skips JSON
+# float stringification and multiplexes parallel batches, which is
+# markedly cheaper than REST for embedding-heavy uploads. Falls back to
+# the REST client when the grpc extra isn't installed.
+try:
+    from pinecone.grpc import PineconeGRPC as Pinecone
+    _USE_GRPC = True
+except ImportError:
+    from pinecone import Pinecone
+    _USE_GRPC = False
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import HTTPError as Urllib3HTTPError
+from urllib3.util.retry import Retry
+from pinecone.exceptions import PineconeApiException, PineconeException
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_random_exponential
+import itertools
+import orjson
 import uuid
 import os
 
+_TRANSIENT_GRPC_CODES = ("UNAVAILABLE", "RESOURCE_EXHAUSTED", "DEADLINE_EXCEEDED")
+
+def _is_retryable_upsert_error(exc: Exception) -> bool:
+    """Retry only transient failures: connection trouble, 429s and 5xx.
+
+    Matches what the SDK actually raises — urllib3 connection errors
+    (ProtocolError, MaxRetryError) on the REST path, PineconeApiException
+    with an HTTP status, and UNAVAILABLE / RESOURCE_EXHAUSTED /
+    DEADLINE_EXCEEDED errors on the gRPC path. Permanent rejections
+    (oversized payload, malformed vector — 4xx other than 429) fail fast
+    rather than burn five backoff attempts.
+    """
+    if isinstance(exc, (ConnectionError, TimeoutError, Urllib3HTTPError)):
+        return True
+
+    # PineconeApiException and friends carry the HTTP status as an int
+    status = getattr(exc, "status", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+
+    # Raw gRPC errors expose a StatusCode through .code()
+    code = getattr(exc, "code", None)
+    code = code() if callable(code) else code
+    name = getattr(code, "name", None)
+    if name is not None:
+        return name in _TRANSIENT_GRPC_CODES
+
+    # The gRPC client also surfaces transport errors wrapped in
+    # PineconeException with the status name embedded in the message
+    if _USE_GRPC and isinstance(exc, PineconeException) and not isinstance(exc, PineconeApiException):
+        message = str(exc)
+        return any(grpc_code in message for grpc_code in _TRANSIENT_GRPC_CODES)
+
+    return False
+
+def _batches(iterable, batch_size):
+    """Yield tuples of up to batch_size items from an iterable."""
+    it = iter(iterable)
+    while True:
+        batch = tuple(itertools.islice(it, batch_size))
+        if not batch:
+            return
+        yield batch
+
+def _split_batches(vectors, max_count=100, max_bytes=1_800_000):
+    """
+    Yield upsert batches capped by both vector count and estimated bytes.
+
+    Pinecone rejects requests over 2MB; a count-only split can exceed that
+    on high-dimension vectors, surfacing as a 4xx late in the sync. Sizes
+    are estimated from the value count plus per-vector JSON overhead, with
+    headroom under the hard limit.
+    """
+    batch, batch_bytes = [], 0
+    for vector in vectors:
+        size = 8 * len(vector["values"]) + 200
+        if batch and (len(batch) >= max_count or batch_bytes + size > max_bytes):
+            yield batch
+            batch, batch_bytes = [], 0
+        batch.append(vector)
+        batch_bytes += size
+    if batch:
+        yield batch
+
+# Data-plane hosts keyed by index name, so repeated constructions in the
+# same process skip the describe_index control-plane round-trip.
+_HOST_CACHE: Dict[str, str] = {}
+
 class PineconeService:
     """Service to interact with Pinecone index for document chunks."""
 
-    def __init__(self):
+    def __init__(self, batch_size: int = 100, pool_threads: int = 30):
 
         self.api_key = os.getenv("PINECONE_API_KEY", "")
         self.index_name = os.getenv("PINECONE_INDEX_NAME", "")
+        self.batch_size = batch_size
 
         if not self.api_key:
             raise ValueError("Missing PINECONE_API_KEY environment variable.")
@@ -19,7 +107,12 @@ class PineconeService:
             raise ValueError("Missing PINECONE_INDEX_NAME environment variable.")
 
         self.pc = Pinecone(api_key=self.api_key)
-        self.index = self.pc.Index(self.index_name)
+        if _USE_GRPC:
+            # gRPC multiplexes async_req upserts over HTTP/2 streams itself
+            self.index = self.pc.Index(self.index_name)
+        else:
+            # pool_threads backs the async_req upserts below
+            self.index = self.pc.Index(self.index_name, pool_threads=pool_threads)
 
         # API request, filter by metadata feature
         self.api_version = "2025-10"
@@ -28,96 +121,270 @@ class PineconeService:
             "Content-Type": "application/json",
             "X-Pinecone-API-Version": self.api_version,
         }
-        index_info = self.pc.describe_index(self.index_name)
-        self.index_host = index_info.get('host', None)
+        self.index_host = self._resolve_index_host()
+
+        # Keep-alive session for the data-plane HTTP calls: reuses TCP/TLS
+        # connections across fetches instead of paying a handshake per call,
+        # and retries transient 429/5xx responses with backoff.
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(
+            pool_connections=30,
+            pool_maxsize=30,
+            max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504]),
+        )
+        self.session.mount("https://", adapter)
 
         logger.info(f"✅ Connected to Pinecone: {self.index_host} | Index: {self.index_name}")
 
+    def _resolve_index_host(self):
+        """Resolve the index data-plane host, avoiding describe_index when possible."""
+        host = os.getenv("PINECONE_INDEX_HOST") or _HOST_CACHE.get(self.index_name)
+        if not host:
+            host = self.pc.describe_index(self.index_name).get('host', None)
+            if host:
+                _HOST_CACHE[self.index_name] = host
+        return host
+
     def sync(
-        self, 
-        embeddings: Dict[str, List[Dict[str, Any]]]
+        self,
+        embeddings
     ) -> int:
-        """Sync embeddings to Pinecone."""
+        """
+        Sync embeddings to Pinecone.
+
+        Accepts either a {document_id: chunks} dict or an iterable of
+        (document_id, chunks) pairs — generators included, so producers
+        like EmbeddingService.iter_embedded_groups can stream documents
+        through without materializing the whole corpus in memory.
+
+        Batches are awaited through a bounded in-flight window: up to
+        _MAX_IN_FLIGHT submissions overlap (across documents as well as
+        within them), and each batch's expanded payload is released as
+        soon as its result lands, so peak memory stays at O(window)
+        rather than O(corpus).
+        """
         total_upserted = 0
+        pending = deque()
+
+        items = embeddings.items() if isinstance(embeddings, dict) else embeddings
+        for document_id, chunks in items:
+            chunks = list(chunks)
+            logger.debug("Document ID: %s | Chunks - %d", document_id, len(chunks))
+            vectors = self._build_vectors(chunks, document_id)
+            total_upserted += len(vectors)
+            for batch in _split_batches(vectors, self.batch_size):
+                if len(pending) >= self._MAX_IN_FLIGHT:
+                    self._await_one(*pending.popleft())
+                pending.append((batch, self.index.upsert(vectors=batch, async_req=True)))
 
-        for document_id, chunks in embeddings.items():
-            logger.debug(f"Document ID: {document_id} | Chunks - {len(chunks)}")
-            upserted = self.upsert_chunks(chunks, document_id)
-            total_upserted += upserted
+        while pending:
+            self._await_one(*pending.popleft())
+
+        logger.info(f"[Pinecone] Upserted {total_upserted} vectors")
         return total_upserted
-    
-    def upsert_chunks(
+
+    # Submitted-but-unawaited batches each pin their expanded float
+    # payload, so the window bounds peak memory while keeping enough
+    # requests in flight to saturate the connection.
+    _MAX_IN_FLIGHT = 32
+
+    def _await_upserts(self, async_results) -> None:
+        """
+        Wait on (batch, async_result) pairs, re-sending any failed batch
+        synchronously with jittered exponential backoff.
+        """
+        for batch, result in async_results:
+            self._await_one(batch, result)
+
+    def _await_one(self, batch, result) -> None:
+        """Wait on one async upsert, re-sending its batch with backoff on failure."""
+        try:
+            # REST async_req returns a multiprocessing-style result with
+            # .get(); the gRPC client returns a concurrent.futures.Future
+            # exposing .result() instead.
+            if hasattr(result, "get"):
+                result.get()
+            else:
+                result.result()
+        except Exception as e:
+            logger.warning("[Pinecone] Async upsert of %d vector(s) failed (%s); retrying with backoff.", len(batch), e)
+            self._upsert_batch_with_retry(batch)
+
+    @retry(
+        retry=retry_if_exception(_is_retryable_upsert_error),
+        stop=stop_after_attempt(5),
+        wait=wait_random_exponential(multiplier=0.5, max=8),
+        reraise=True,
+    )
+    def _upsert_batch_with_retry(self, batch) -> None:
+        """Retry one upsert batch with backoff and jitter, raising after 5 attempts."""
+        self.index.upsert(vectors=list(batch))
+
+    def _build_vectors(
         self,
         chunks: List[Dict[str, Any]],
         document_id: str
-    ) -> int:
-        vectors = []
+    ) -> List[Dict[str, Any]]:
+        """Build upsert payloads for a document's chunks, skipping invalid ones."""
+        # One filtering pass, then a straight comprehension over valid chunks —
+        # no per-chunk try/except setup or append bookkeeping in the hot path.
+        valid = [
+            chunk for chunk in chunks
+            if chunk.get("id")
+            and chunk.get("embedding") is not None
+            and len(chunk["embedding"]) > 0
+        ]
 
-        for chunk in chunks:
-            try:
-                if not chunk.get("id"):
-                    raise ValueError("Missing chunk ID from database")
-
-                embedding = chunk.get("embedding")
-                if not embedding:
-                    raise ValueError("Missing embedding")
-
-                vectors.append({
-                    "id": str(chunk["id"]),  # MySQL ID
-                    "values": embedding,
-                    "metadata": {
-                        "document_id": str(document_id),
-                        "chunk_index": int(chunk["chunk_index"]),
-                        "token_count": int(chunk.get("token_count", 0)),
-                    }
-                })
-
-            except Exception as e:
-                logger.error(
-                    f"[Pinecone] Skipping chunk "
-                    f"[doc={document_id} | chunk={chunk.get('id')}]: {e}"
-                )
+        skipped = len(chunks) - len(valid)
+        if skipped:
+            logger.error(
+                "[Pinecone] Skipping %d chunk(s) with missing ID or embedding [doc=%s]",
+                skipped, document_id
+            )
 
+        # Embeddings arrive as float32 numpy arrays; the SDK payload
+        # wants plain lists, so convert per vector here.
+        return [
+            {
+                "id": str(chunk["id"]),  # MySQL ID
+                "values": chunk["embedding"].tolist()
+                if hasattr(chunk["embedding"], "tolist") else chunk["embedding"],
+                "metadata": {
+                    "document_id": str(document_id),
+                    "chunk_index": int(chunk["chunk_index"]),
+                    "token_count": int(chunk.get("token_count", 0)),
+                }
+            }
+            for chunk in valid
+        ]
+
+    def upsert_chunks(
+        self,
+        chunks: List[Dict[str, Any]],
+        document_id: str
+    ) -> int:
+        vectors = self._build_vectors(chunks, document_id)
         if not vectors:
             return 0
 
-        self.index.upsert(vectors=vectors)
-        logger.info(f"[Pinecone] Upserted {len(vectors)} vectors")
+        # Submit batches through the index thread pool and wait on all of
+        # them, so the upsert round-trips overlap instead of running serially.
+        async_results = [
+            (batch, self.index.upsert(vectors=batch, async_req=True))
+            for batch in _split_batches(vectors, self.batch_size)
+        ]
+        self._await_upserts(async_results)
+
+        # Per-document detail stays at DEBUG; sync() reports the total.
+        logger.debug("[Pinecone] Upserted %d vectors", len(vectors))
 
         return len(vectors)
 
 
     # Get existing chunks embedding
     def get_chunks_by_document(
-        self, 
-        document_id: str, 
-        limit: int = 1000
+        self,
+        document_id: str,
+        limit: int = 1000,
+        include_values: bool = False,
+        include_metadata: bool = False
     ) -> Dict[str, Any]:
         """
         Fetch chunks from Pinecone by document_id metadata.
         Returns a dict where keys are chunk IDs.
+
+        Values and metadata are excluded by default — callers that only
+        diff against the returned IDs would otherwise pull ~6KB of floats
+        per vector off the wire just to throw them away.
         """
         url = f"https://{self.index_host}/vectors/fetch_by_metadata"
         payload = {
             "namespace": "__default__",
             "filter": {"document_id": {"$eq": document_id}},
-            "limit": limit
+            "limit": limit,
+            "include_values": include_values,
+            "include_metadata": include_metadata
         }
 
         try:
-            response = requests.post(url, headers=self.headers, json=payload)
+            response = self.session.post(url, data=orjson.dumps(payload), timeout=(3.05, 30))
             response.raise_for_status()
-            data = response.json()
+            data = orjson.loads(response.content)
             vectors = data.get("vectors", {})
             if not isinstance(vectors, dict):
                 logger.warning("[Pinecone] Unexpected response format — expected dict of vectors.")
                 return {}
-            logger.info(f"[Pinecone] Retrieved {len(vectors)} existing chunk(s) for document {document_id}")
+            logger.debug("[Pinecone] Retrieved %d existing chunk(s) for document %s", len(vectors), document_id)
             return vectors
         except Exception as e:
             logger.error(f"[Pinecone] Error fetching chunks for {document_id}: {e}")
             return {}
 
+    def get_chunks_by_documents(
+        self,
+        document_ids: List[str],
+        limit: int = 10000,
+        include_values: bool = False
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Fetch existing chunks for many documents with one metadata query,
+        instead of one fetch round-trip per document.
+
+        Values are excluded by default (metadata is always requested — the
+        grouping below needs document_id), cutting the response to a small
+        fraction of its full-vector size.
+
+        Returns a dict of {document_id: {chunk_id: vector}}; documents with
+        no stored chunks map to an empty dict.
+        """
+        if not document_ids:
+            return {}
+
+        url = f"https://{self.index_host}/vectors/fetch_by_metadata"
+        payload = {
+            "namespace": "__default__",
+            "filter": {"document_id": {"$in": [str(doc_id) for doc_id in document_ids]}},
+            "limit": limit,
+            "include_values": include_values,
+            "include_metadata": True
+        }
+
+        grouped = {str(doc_id): {} for doc_id in document_ids}
+        try:
+            response = self.session.post(url, data=orjson.dumps(payload), timeout=(3.05, 30))
+            response.raise_for_status()
+            vectors = orjson.loads(response.content).get("vectors", {})
+            if not isinstance(vectors, dict):
+                logger.warning("[Pinecone] Unexpected response format — expected dict of vectors.")
+                return grouped
+            for chunk_id, vector in vectors.items():
+                doc_id = str((vector.get("metadata") or {}).get("document_id"))
+                grouped.setdefault(doc_id, {})[chunk_id] = vector
+            logger.info(f"[Pinecone] Retrieved {len(vectors)} existing chunk(s) across {len(document_ids)} document(s)")
+        except Exception as e:
+            logger.error(f"[Pinecone] Error fetching chunks for {len(document_ids)} document(s): {e}")
+        return grouped
+
+    def delete_by_ids(self, chunk_ids: List[str]) -> int:
+        """
+        Delete vectors by ID across any number of documents.
+
+        Callers should accumulate stale IDs across documents and make one
+        call here; IDs are sent in batches of 1000 (the per-request API
+        limit) instead of one delete round-trip per document.
+        """
+        if not chunk_ids:
+            return 0
+
+        deleted = 0
+        for batch in _batches(chunk_ids, 1000):
+            self.index.delete(ids=list(batch))
+            deleted += len(batch)
+
+        logger.info(f"[Pinecone] Deleted {deleted} vector(s) by ID")
+        return deleted
+
     def clear_index(self, namespace: str = "__default__") -> bool:
         """
         Clear all vectors from the Pinecone index.
@@ -136,4 +403,41 @@ class PineconeService:
             logger.info(f"[Pinecone] Cleared index '{self.index_name}' namespace '{namespace}'.")
             return True
         except Exception as e:
-            logger.warning(f"[Pinecone] Failed to clear index: {e}")
\ No newline at end of file
+            logger.warning(f"[Pinecone] Failed to clear index: {e}")
+            return False
+
+    def clear_all_namespaces(self) -> bool:
+        """
+        Clear every namespace in the index, deleting namespaces concurrently.
+
+        Returns:
+            True if all namespaces were cleared successfully, False otherwise.
+        """
+        try:
+            stats = self.index.describe_index_stats()
+            namespaces = list(stats.get('namespaces', {}).keys())
+        except Exception as e:
+            logger.warning(f"[Pinecone] Failed to list namespaces: {e}")
+            return False
+
+        if not namespaces:
+            logger.info(f"[Pinecone] Index '{self.index_name}' has no namespaces to clear.")
+            return True
+
+        # Namespace deletes are independent index-side operations,
+        # so they can run in parallel.
+        with ThreadPoolExecutor(max_workers=min(16, len(namespaces))) as executor:
+            results = list(executor.map(self.clear_index, namespaces))
+        return all(results)
+
+# Process-wide instance: constructing the service binds the Pinecone
+# client, resolves the index host and builds the HTTP session, so callers
+# that would otherwise instantiate per request share one.
+_instance = None
+
+def get_pinecone_service() -> PineconeService:
+    """Return the shared PineconeService, constructing it on first use."""
+    global _instance
+    if _instance is None:
+        _instance = PineconeService()
+    return _instance
\ No newline at end of file
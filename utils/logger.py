@@ -1,18 +1,45 @@
+import atexit
 import logging
+import os
+import queue
 import sys
+from logging.handlers import QueueHandler, QueueListener
+
+# Default to INFO so per-item DEBUG lines in hot loops are skipped before
+# formatting; set LOG_LEVEL=DEBUG to get the verbose trace back.
+_LEVEL = getattr(logging, os.getenv("LOG_LEVEL", "INFO").upper(), logging.INFO)
+
+# We never log thread/process names, so skip collecting them per record —
+# this trims a few attribute lookups and allocations off every log call
+# in chunk-heavy loops.
+logging.logThreads = False
+logging.logProcesses = False
+logging.logMultiprocessing = False
 
 # Create a simple logger
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
+logger.setLevel(_LEVEL)
+logger.propagate = False  # don't double-emit through the root logger
+
+# Configure once — re-imports must not stack duplicate handlers,
+# which would multiply the I/O done per log call.
+if not logger.handlers:
+    # Console handler
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setLevel(_LEVEL)
 
-# Console handler
-console_handler = logging.StreamHandler(sys.stdout)
-console_handler.setLevel(logging.DEBUG)
+    # Formatter
+    formatter = logging.Formatter(
+        "%(asctime)s | %(levelname)s | %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
+    )
+    console_handler.setFormatter(formatter)
 
-# Formatter
-formatter = logging.Formatter(
-    "%(asctime)s | %(levelname)s | %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
-)
-console_handler.setFormatter(formatter)
+    # Hand records to a background listener thread, so the calling thread
+    # only enqueues — formatting and the stdout write (which takes the
+    # stdio lock and may block on a slow TTY) happen off the hot path.
+    _log_queue = queue.Queue(-1)
+    logger.addHandler(QueueHandler(_log_queue))
 
-logger.addHandler(console_handler)
\ No newline at end of file
+    _listener = QueueListener(_log_queue, console_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)  # drain pending records on shutdown
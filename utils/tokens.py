@@ -1,11 +1,36 @@
 import tiktoken
 import os
+from functools import lru_cache
 from dotenv import load_dotenv
 
 load_dotenv()
 
-encoding = tiktoken.encoding_for_model(os.getenv("OPENAI_MODEL"))
+_MODEL = os.getenv("OPENAI_MODEL")
 
+@lru_cache(maxsize=None)
+def _get_encoding(model: str):
+    """Return the tiktoken encoding for a model, loading it only once."""
+    return tiktoken.encoding_for_model(model)
+
+@lru_cache(maxsize=200_000)
 def count_tokens(text: str) -> int:
-    """Return number of tokens in a string."""
-    return len(encoding.encode(text))
\ No newline at end of file
+    """
+    Return number of tokens in a string.
+
+    Counts are cached per string — boilerplate sentences (headers, footers)
+    repeat across documents, so repeated BPE passes are skipped.
+    """
+    return len(_get_encoding(_MODEL).encode(text))
+
+def count_tokens_batch(texts) -> list:
+    """
+    Return token counts for a list of strings in one pass.
+
+    encode_batch runs in tiktoken's Rust core across GIL-free threads, so
+    counting a document's sentences together is close to N-cores faster
+    than calling count_tokens per sentence.
+    """
+    if not texts:
+        return []
+    num_threads = min(8, os.cpu_count() or 1)
+    return [len(ids) for ids in _get_encoding(_MODEL).encode_batch(texts, num_threads=num_threads)]